@@ -0,0 +1,27 @@
+"""
+GenAI Document Assistant - Server Entry Point
+
+Starts the API server with `python -m app`. This module only imports uvicorn,
+which loads `app.main` itself. Keeping the entry point out of app/main.py
+matters because the PDF extraction processes are spawned: each one re-imports
+the `__main__` module, and must not rebuild the app, its log listener and its
+database connection when it does.
+"""
+
+import os
+
+import uvicorn
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 8000))
+    # Use the libuv event loop and C HTTP parser shipped with uvicorn[standard]
+    # Keep WORKERS at 1 unless DOCUMENT_DB is set, since otherwise documents
+    # are only stored in the memory of the worker that processed the upload
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WORKERS", 1)),
+    )
@@ -1,29 +1,115 @@
-import json
-import re
+import asyncio
+import atexit
+import logging
+import logging.handlers
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import queue
+import orjson
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from cachetools import LRUCache
+from typing import Annotated
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
+# --- Logging ---
+# Configured before the app modules are imported so their startup messages are
+# captured. Records are handed to a background thread through a queue, so
+# writing them to stderr never blocks the event loop.
+_log_queue = queue.SimpleQueue()
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
+)
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)  # flush queued records on exit
+
+logger = logging.getLogger(__name__)
+
 # Import custom modules for document processing and AI functionality
-from app.utils import extract_text_from_upload_file
+from app.utils import InvalidDocumentError, extract_text_from_file, save_upload_to_tempfile
+from app.store import DOCUMENT_DB, DocumentDB
 from app.llm import (
-    generate_summary,
+    AnswerBatcher,
+    ChunkIndex,
+    SemanticCache,
+    build_chunk_index,
+    generate_summary_and_questions,
     generate_questions,
-    answer_question,
+    answer_question_stream,
     evaluate_answer,
+    warm_up,
 )
 
-# --- In-Memory Storage ---
-# Simple dictionary-based storage for the current session's document data
-# This stores the processed document content and AI-generated materials
+# --- Document Storage ---
+# Documents are kept in a bounded LRU cache keyed by a hash of their content,
+# so several users can work with different documents at the same time. The
+# least recently used document is evicted once the cache is full. When
+# DOCUMENT_DB is set, documents are also saved to a SQLite database shared by
+# all worker processes, and a cache miss is loaded from there.
+
+@dataclass
+class DocEntry:
+    """
+    A processed document and the AI-generated materials for it.
+    
+    Attributes:
+        filename (str): Original name of the uploaded file
+        text (str): Extracted text content of the document
+        summary (str): AI-generated summary of the document
+        questions (list[str]): Current challenge questions
+        answer_cache (SemanticCache): Earlier answers to questions about this document
+        chunk_index (ChunkIndex | None): Searchable chunks, built at upload for long documents
+        answer_batcher (AnswerBatcher): Combines questions about this document asked at the same time
+        generated_questions (dict[int, list[str]]): Regenerated questions by number of questions
+    """
+    filename: str
+    text: str
+    summary: str = ""
+    questions: list[str] = field(default_factory=list)
+    answer_cache: SemanticCache = field(default_factory=SemanticCache)
+    chunk_index: ChunkIndex | None = None
+    answer_batcher: AnswerBatcher = field(default_factory=AnswerBatcher)
+    generated_questions: dict[int, list[str]] = field(default_factory=dict)
+
+document_store: LRUCache[str, DocEntry] = LRUCache(
+    maxsize=int(os.getenv("DOCUMENT_STORE_SIZE", 32))
+)
 
-document_store = {
-    "filename": "",      
-    "text": "",         
-    "summary": "",       
-    "questions": [],    
-}
+document_db: DocumentDB | None = DocumentDB(DOCUMENT_DB) if DOCUMENT_DB else None
+
+async def get_document(doc_id: str) -> DocEntry:
+    """
+    Look up a processed document by its id.
+    
+    Checks this process's cache first, then the shared database if one is
+    configured.
+    
+    Args:
+        doc_id (str): The id returned by the /api/upload endpoint
+        
+    Returns:
+        DocEntry: The stored document
+        
+    Raises:
+        HTTPException: 404 if the document was never uploaded or has been evicted
+    """
+    entry = document_store.get(doc_id)
+    if entry is None and document_db is not None:
+        stored = await asyncio.to_thread(document_db.load, doc_id)
+        if stored is not None:
+            entry = document_store[doc_id] = DocEntry(**stored)
+    if entry is None:
+        raise HTTPException(
+            status_code=404, 
+            detail="Document not found. Please upload a document first via the /api/upload endpoint."
+        )
+    return entry
 
 # --- Pydantic Models for API Request/Response Validation ---
 
@@ -32,8 +118,10 @@ class AskRequest(BaseModel):
     Request model for the /api/ask endpoint.
     
     Attributes:
+        doc_id (str): The id of the document returned by /api/upload
         question (str): The user's question about the document content
     """
+    doc_id: str
     question: str
 
 class ChallengeRequest(BaseModel):
@@ -41,18 +129,40 @@ class ChallengeRequest(BaseModel):
     Request model for the /api/challenge endpoint.
     
     Attributes:
+        doc_id (str): The id of the document returned by /api/upload
         question (str): The challenge question being answered
         answer (str): The user's answer to the challenge question
     """
+    doc_id: str
     question: str
     answer: str
 
+# Number of challenge questions, validated by FastAPI before the endpoint runs
+NumQuestions = Annotated[int, Query(ge=3, le=10, description="Number of questions to generate (3-10)")]
+
+# Document named by a `doc_id` query parameter, resolved by FastAPI once per
+# request before the endpoint runs
+QueryDocument = Annotated[DocEntry, Depends(get_document)]
+
 # --- FastAPI Application Configuration ---
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm the Gemini connection in the background while the server starts.
+    
+    Running it as a task keeps startup fast; the reference is kept on
+    app.state so the task is not garbage collected before it finishes.
+    """
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+    yield
+
 app = FastAPI(
     title="GenAI Document Assistant",
     description="Upload a document (PDF/TXT) to interact with it. Supports Q&A, content-based challenges, and provides an automatic summary.",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS middleware to allow React frontend communication
@@ -65,8 +175,8 @@ allowed_origins = os.getenv("ALLOWED_ORIGINS", "").split(",") if os.getenv("ALLO
 # Remove empty strings and strip whitespace
 allowed_origins = [origin.strip() for origin in allowed_origins if origin.strip()]
 
-# Print allowed origins for debugging
-print(f"Allowed CORS origins: {allowed_origins}")
+# Log allowed origins for debugging
+logger.info("Allowed CORS origins: %s", allowed_origins)
 
 app.add_middleware(
     CORSMiddleware,
@@ -76,6 +186,10 @@ app.add_middleware(
     allow_headers=["*"],                     
 )
 
+# Compress JSON responses such as summaries and question lists. Starlette
+# skips text/event-stream, so streamed answers are still sent as they arrive.
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 # --- API Endpoints ---
 
 @app.get("/", tags=["Health"])
@@ -99,8 +213,14 @@ async def options_handler(path: str):
     """
     return {}
 
+# Largest accepted upload; bigger files are rejected before they are processed
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_MB", 50)) * 1024 * 1024
+
+# Content types browsers and API clients send for PDF and TXT files
+ALLOWED_CONTENT_TYPES = {"application/pdf", "text/plain", "application/octet-stream"}
+
 @app.post("/api/upload", tags=["API"])
-async def http_upload_document(file: UploadFile = File(...), num_questions: int = 3):
+async def http_upload_document(file: UploadFile = File(...), num_questions: NumQuestions = 3):
     """
     Upload and process a document for AI analysis.
     
@@ -113,15 +233,20 @@ async def http_upload_document(file: UploadFile = File(...), num_questions: int
         num_questions (int): Number of challenge questions to generate (3-10)
         
     Returns:
-        dict: Contains filename, AI-generated summary, and list of questions
+        dict: Contains the document id, filename, AI-generated summary, and
+              list of questions. The id is passed to the other endpoints.
         
     Raises:
         HTTPException: 
-            - 400: If file format is unsupported or num_questions is invalid
+            - 400: If file format is unsupported, or the file is empty or not text
+            - 413: If the file is larger than MAX_UPLOAD_MB
+            - 415: If the file's content type is not PDF or plain text
+            - 422: If num_questions is not between 3 and 10
             - 500: If document processing fails
             
     Example Response:
         {
+            "doc_id": "3f2a9c1d8e7b6a50",
             "filename": "document.pdf",
             "summary": "This document discusses...",
             "questions": ["What is the main topic?", "..."]
@@ -134,35 +259,72 @@ async def http_upload_document(file: UploadFile = File(...), num_questions: int
             detail="Unsupported file format. Please upload a PDF or TXT file."
         )
 
-    # Validate the number of questions parameter
-    if num_questions < 3 or num_questions > 10:
+    # Validate the declared content type and size before reading the file
+    content_type = (file.content_type or "application/octet-stream").split(";")[0].strip()
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415, 
+            detail="Unsupported content type. Please upload a PDF or TXT file."
+        )
+    if file.size is not None and file.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=413, 
+            detail=f"File is too large. The maximum size is {MAX_UPLOAD_SIZE // (1024 * 1024)} MB."
+        )
+    if file.size == 0:
         raise HTTPException(
             status_code=400, 
-            detail="Number of questions must be between 3 and 10."
+            detail="The uploaded file is empty."
         )
 
     try:
-        # Extract text content from the uploaded file
-        text = extract_text_from_upload_file(file)
+        # Stream the upload to a temporary file in chunks rather than holding
+        # it in memory, then extract its text in a worker thread since PDF
+        # parsing is CPU-bound. The file is removed once its text is read.
+        path, digest = await save_upload_to_tempfile(file)
+        try:
+            text = await asyncio.to_thread(extract_text_from_file, path, file.filename)
+        finally:
+            os.remove(path)
         
-        # Store the extracted text and filename in memory
-        document_store["text"] = text
-        document_store["filename"] = file.filename
+        # Identify the document by a hash of its raw bytes, computed while
+        # the upload was being saved
+        doc_id = digest[:16]
 
-        # Generate AI-powered summary and questions
-        summary = generate_summary(text)
-        questions = generate_questions(text, num_questions)
+        # Generate AI-powered summary and questions in a single call so the
+        # document is only sent to Gemini once. Long documents are chunked and
+        # embedded at the same time, once, for answering questions later.
+        (summary, questions), chunk_index = await asyncio.gather(
+            generate_summary_and_questions(text, num_questions),
+            build_chunk_index(text),
+        )
 
-        # Store the AI-generated content for later use
-        document_store["summary"] = summary
-        document_store["questions"] = questions
+        # Store the document and its AI-generated content for later use
+        document_store[doc_id] = DocEntry(
+            filename=file.filename,
+            text=text,
+            summary=summary,
+            questions=questions,
+            chunk_index=chunk_index,
+        )
+        if document_db is not None:
+            await asyncio.to_thread(
+                document_db.save, doc_id, file.filename, text, summary, questions, chunk_index
+            )
 
         # Return the processed results to the client
         return {
+            "doc_id": doc_id,
             "filename": file.filename,
             "summary": summary,
             "questions": questions,
         }
+    except InvalidDocumentError as e:
+        # The file was read but is not a usable document
+        raise HTTPException(
+            status_code=400, 
+            detail=str(e)
+        )
     except Exception as e:
         # Handle any errors during document processing
         raise HTTPException(
@@ -176,61 +338,83 @@ async def http_ask_question(request: AskRequest):
     Answer a free-form question about the uploaded document.
     
     This endpoint uses AI to answer user questions based on the content
-    of the most recently uploaded document. The AI is instructed to base
-    answers only on the document content, not external knowledge.
+    of the uploaded document identified by `doc_id`. The AI is instructed to
+    base answers only on the document content, not external knowledge.
+    
+    The answer is streamed as Server-Sent Events while Gemini generates it,
+    so clients can display it immediately instead of waiting for the whole
+    response. Each `data` event carries a JSON object with the next piece
+    of text, and a final `done` event marks the end of the answer.
     
     Args:
-        request (AskRequest): Contains the user's question
+        request (AskRequest): Contains the document id and the user's question
         
     Returns:
-        dict: Contains the AI-generated answer
+        StreamingResponse: A `text/event-stream` of answer chunks
         
     Raises:
         HTTPException:
-            - 400: If no document has been uploaded
-            - 500: If answer generation fails
+            - 404: If the document has not been uploaded
             
     Example Response:
-        {
-            "answer": "Based on the document, the main topic is..."
-        }
+        data: {"text": "Based on the document, "}
+
+        data: {"text": "the main topic is..."}
+
+        event: done
+        data: {}
     """
-    # Check if a document has been uploaded and processed
-    if not document_store["text"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="No document uploaded. Please upload a document first via the /api/upload endpoint."
-        )
+    # Check if the document has been uploaded and processed
+    document = await get_document(request.doc_id)
     
-    try:
-        # Generate AI answer based on document content and user question
-        answer = answer_question(document_store["text"], request.question)
-        return {"answer": answer}
-    except Exception as e:
-        # Handle any errors during answer generation
-        raise HTTPException(
-            status_code=500, 
-            detail=f"An error occurred: {e}"
-        )
+    async def event_stream():
+        # Forward each piece of the AI answer as a separate SSE event
+        async for chunk in answer_question_stream(
+            document.text,
+            request.question,
+            answer_cache=document.answer_cache,
+            chunk_index=document.chunk_index,
+            batcher=document.answer_batcher,
+        ):
+            yield f"data: {orjson.dumps({'text': chunk}).decode()}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    # Ask caches and reverse proxies (e.g. nginx) to pass events through as
+    # they are produced rather than buffering the whole answer
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/api/regenerate-questions", tags=["API"])
-async def http_regenerate_questions(num_questions: int = 3):
+async def http_regenerate_questions(
+    doc_id: str, document: QueryDocument, num_questions: NumQuestions = 3, fresh: bool = False
+):
     """
     Generate new challenge questions for the current document.
     
     This endpoint creates a fresh set of AI-generated questions based on
-    the currently uploaded document. Useful when users want different
-    questions or want to adjust the number of questions.
+    the uploaded document identified by `doc_id`. Questions generated for a
+    given number are remembered for the document, so switching back to an
+    earlier number returns them without another AI call. Pass `fresh=true`
+    when the user wants different questions: the remembered and cached
+    questions are skipped and a new set is generated.
     
     Args:
+        doc_id (str): The id of the document returned by /api/upload
+        document (DocEntry): The document with that id, resolved by FastAPI
         num_questions (int): Number of questions to generate (3-10)
+        fresh (bool): Generate a new set even if questions for this number
+                      were generated before (default: False)
         
     Returns:
         dict: Contains the list of newly generated questions
         
     Raises:
         HTTPException:
-            - 400: If no document uploaded or invalid num_questions
+            - 404: If the document has not been uploaded
+            - 422: If num_questions is not between 3 and 10
             - 500: If question generation fails
             
     Example Response:
@@ -238,26 +422,20 @@ async def http_regenerate_questions(num_questions: int = 3):
             "questions": ["What is the methodology?", "What are the results?", "..."]
         }
     """
-    # Ensure a document has been uploaded
-    if not document_store["text"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="No document uploaded. Please upload a document first."
-        )
-    
-    # Validate the number of questions parameter
-    if num_questions < 3 or num_questions > 10:
-        raise HTTPException(
-            status_code=400, 
-            detail="Number of questions must be between 3 and 10."
-        )
-    
     try:
-        # Generate new questions using AI
-        questions = generate_questions(document_store["text"], num_questions)
+        # Reuse questions already generated for this number, unless new ones
+        # were asked for
+        questions = None if fresh else document.generated_questions.get(num_questions)
+        if questions is None:
+            # Generate new questions using AI
+            questions = await generate_questions(document.text, num_questions, fresh=fresh)
+            if questions:
+                document.generated_questions[num_questions] = questions
         
         # Update the stored questions with the new ones
-        document_store["questions"] = questions
+        document.questions = questions
+        if document_db is not None:
+            await asyncio.to_thread(document_db.update_questions, doc_id, questions)
         
         return {"questions": questions}
     except Exception as e:
@@ -277,14 +455,15 @@ async def http_evaluate_challenge(request: ChallengeRequest):
     a correctness assessment and detailed feedback.
     
     Args:
-        request (ChallengeRequest): Contains the question and user's answer
+        request (ChallengeRequest): Contains the document id, the question
+                                    and the user's answer
         
     Returns:
         dict: Contains evaluation feedback and correctness boolean
         
     Raises:
         HTTPException:
-            - 400: If no document has been uploaded
+            - 404: If the document has not been uploaded
             - 500: If evaluation fails
             
     Example Response:
@@ -293,67 +472,27 @@ async def http_evaluate_challenge(request: ChallengeRequest):
             "is_correct": true
         }
     """
-    # Ensure a document has been uploaded for evaluation context
-    if not document_store["text"]:
-        raise HTTPException(
-            status_code=400, 
-            detail="No document uploaded. Please upload a document first."
-        )
+    # Ensure the document has been uploaded for evaluation context
+    document = await get_document(request.doc_id)
     
     try:
         # Get AI evaluation of the user's answer
-        evaluation_response = evaluate_answer(
-            context=document_store["text"],
+        evaluation_response = await evaluate_answer(
+            context=document.text,
             question=request.question,
-            user_answer=request.answer
+            user_answer=request.answer,
+            chunk_index=document.chunk_index,
         )
         
-        # Clean up the AI response by removing any markdown formatting
-        # The AI sometimes returns JSON wrapped in markdown code blocks
-        cleaned_response = evaluation_response.strip()
-        
-        # Remove markdown code block markers if present
-        if cleaned_response.startswith('```json'):
-            cleaned_response = cleaned_response[7:]  # Remove ```json
-        elif cleaned_response.startswith('```'):
-            cleaned_response = cleaned_response[3:]   # Remove ```
-        
-        if cleaned_response.endswith('```'):
-            cleaned_response = cleaned_response[:-3]  # Remove trailing ```
-        
-        # Remove any remaining whitespace
-        cleaned_response = cleaned_response.strip()
-        
-        # Extract JSON content if it's embedded within other text
-        json_match = re.search(r'\{.*\}', cleaned_response, re.DOTALL)
-        if json_match:
-            cleaned_response = json_match.group(0)
-        
-        # Parse the AI's JSON response
-        try:
-            evaluation_data = json.loads(cleaned_response)
-            return {
-                "evaluation": evaluation_data.get("evaluation", "No evaluation provided"),
-                "is_correct": evaluation_data.get("is_correct", False)
-            }
-        except json.JSONDecodeError as json_error:
-            # Fallback: if JSON parsing fails, return error message
-            print(f"JSON parsing error: {json_error}")
-            print(f"Cleaned response: {cleaned_response}")
-            return {
-                "evaluation": f"Error parsing evaluation response: {evaluation_response}",
-                "is_correct": False
-            }
+        # Structured output guarantees a JSON object with both fields
+        evaluation_data = orjson.loads(evaluation_response)
+        return {
+            "evaluation": evaluation_data["evaluation"],
+            "is_correct": evaluation_data["is_correct"],
+        }
     except Exception as e:
         # Handle any errors during evaluation
         raise HTTPException(
             status_code=500, 
             detail=f"An error occurred: {e}"
         )
-
-if __name__ == "__main__":
-    import uvicorn
-    import os
-    
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+GenAI Document Assistant - Shared Document Store
+
+This module persists processed documents in a SQLite database so that several
+server worker processes (`WORKERS` > 1) can serve the same uploaded document.
+Each worker still keeps its own in-memory LRU cache of recently used
+documents and only reads from the database on a miss.
+
+Only data that can be rebuilt identically in any process is stored: the text,
+summary, questions and the chunk index of long documents. Per-process helpers
+such as the semantic answer cache start empty in each worker.
+
+The store is enabled by setting DOCUMENT_DB to a file path. SQLite runs in
+WAL mode so readers in one worker are not blocked by a write in another.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import closing
+import numpy as np
+import orjson
+
+from app.llm import ChunkIndex
+
+# Path of the SQLite database; unset keeps documents in process memory only
+DOCUMENT_DB = os.getenv("DOCUMENT_DB")
+
+# Maximum number of documents kept in the database before the oldest are removed
+DOCUMENT_DB_SIZE = int(os.getenv("DOCUMENT_DB_SIZE", 1000))
+
+class DocumentDB:
+    """
+    SQLite-backed storage for processed documents, shared between processes.
+
+    Methods are blocking; call them from a worker thread (e.g. via
+    `asyncio.to_thread`) when used from async code.
+
+    Attributes:
+        path (str): Path of the SQLite database file
+        max_documents (int): Number of documents kept before pruning the oldest
+    """
+
+    def __init__(self, path: str, max_documents: int = DOCUMENT_DB_SIZE):
+        self.path = path
+        self.max_documents = max_documents
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    questions BLOB NOT NULL,
+                    chunks BLOB,
+                    vectors BLOB,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that waits for other processes' writes to finish."""
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(
+        self,
+        doc_id: str,
+        filename: str,
+        text: str,
+        summary: str,
+        questions: list[str],
+        chunk_index: ChunkIndex | None,
+    ) -> None:
+        """Insert or replace a document, then prune the oldest beyond the limit."""
+        chunks = vectors = None
+        if chunk_index is not None:
+            chunks = orjson.dumps(chunk_index.chunks)
+            vectors = chunk_index.vectors.astype(np.float32).tobytes()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, filename, text, summary, orjson.dumps(questions), chunks, vectors, time.time()),
+            )
+            conn.execute(
+                """
+                DELETE FROM documents WHERE doc_id NOT IN (
+                    SELECT doc_id FROM documents ORDER BY updated_at DESC LIMIT ?
+                )
+                """,
+                (self.max_documents,),
+            )
+
+    def load(self, doc_id: str) -> dict | None:
+        """
+        Read a stored document.
+
+        Args:
+            doc_id (str): The document id
+
+        Returns:
+            dict | None: The filename, text, summary, questions and chunk_index
+                         of the document, or None if it is not stored
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT filename, text, summary, questions, chunks, vectors FROM documents WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        filename, text, summary, questions, chunks, vectors = row
+        chunk_index = None
+        if chunks is not None:
+            chunks = orjson.loads(chunks)
+            chunk_index = ChunkIndex(
+                chunks, np.frombuffer(vectors, dtype=np.float32).reshape(len(chunks), -1)
+            )
+        return {
+            "filename": filename,
+            "text": text,
+            "summary": summary,
+            "questions": orjson.loads(questions),
+            "chunk_index": chunk_index,
+        }
+
+    def update_questions(self, doc_id: str, questions: list[str]) -> None:
+        """Replace the stored challenge questions of a document."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE documents SET questions = ?, updated_at = ? WHERE doc_id = ?",
+                (orjson.dumps(questions), time.time(), doc_id),
+            )
@@ -3,7 +3,7 @@ GenAI Document Assistant - Utility Functions
 
 This module provides utility functions for document processing, specifically
 text extraction from uploaded files. It supports both PDF and TXT file formats
-and handles the conversion of uploaded file streams into plain text for AI processing.
+and handles the conversion of uploaded file contents into plain text for AI processing.
 
 The module uses PyMuPDF (fitz) for PDF text extraction, which provides robust
 handling of various PDF formats and layouts. For TXT files, it handles proper
@@ -13,86 +13,192 @@ Key Features:
 - PDF text extraction using PyMuPDF library
 - TXT file processing with UTF-8 encoding
 - Robust error handling for file processing failures
-- Support for FastAPI UploadFile objects
-- Proper memory management for file streams
+- Streams uploads to a temporary file in chunks instead of buffering them
+- Works on files on disk so extraction can run in a worker thread off the event loop
 
 Dependencies:
 - PyMuPDF (fitz): For PDF text extraction
-- FastAPI: For UploadFile type support
-- io: For bytes buffer handling
+- tempfile: For spooling uploads to disk
 
 Author: aryanoutlaw
 Version: 1.0.0
 """
 
 import fitz  # PyMuPDF - library for PDF text extraction
+import asyncio
+import codecs
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from fastapi import UploadFile
-import io
 
-def extract_text_from_upload_file(file: UploadFile) -> str:
+
+class InvalidDocumentError(ValueError):
+    """Raised when an uploaded file is readable but is not a usable document."""
+
+# Size of each read from an upload while it is copied to disk
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Largest share of undecodable characters accepted in a TXT file
+MAX_INVALID_TEXT_RATIO = 0.1
+
+# Plain-text extraction only: keep ligatures and whitespace as printed and
+# skip text outside the page. Images are never extracted. Characters without
+# a Unicode mapping come out as U+FFFD rather than raw glyph ids, so extracted
+# text (and the prompts built from it) may contain replacement characters.
+PDF_TEXT_FLAGS = fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+
+async def save_upload_to_tempfile(file: UploadFile) -> tuple[str, str]:
     """
-    Extract text content from an uploaded file (PDF or TXT).
+    Copy an uploaded file to a temporary file on disk in fixed-size chunks.
     
-    This function processes uploaded files and extracts their text content
+    Only one chunk is held in memory at a time, so large uploads never have to
+    be buffered whole. Reads are awaited and disk writes run in a worker
+    thread, so concurrent uploads do not block the event loop. The content is
+    hashed on the way through, which gives the caller a stable document id
+    without reading the file again.
+    
+    Args:
+        file (UploadFile): The uploaded file from a FastAPI endpoint
+        
+    Returns:
+        tuple[str, str]: Path of the temporary file and the SHA-256 hex digest
+                         of its content. The caller must delete the file.
+    """
+    digest = hashlib.sha256()
+    tmp = await asyncio.to_thread(tempfile.NamedTemporaryFile, delete=False)
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            await asyncio.to_thread(tmp.write, chunk)
+    except BaseException:
+        # Do not leave a partial file behind if the upload fails
+        tmp.close()
+        os.remove(tmp.name)
+        raise
+    await asyncio.to_thread(tmp.close)
+    return tmp.name, digest.hexdigest()
+
+# --- Parallel PDF Extraction ---
+# PyMuPDF is not thread-safe and holds the GIL while extracting text, so large
+# PDFs are split into page ranges that separate processes extract side by side.
+# Each process opens the saved file by path, so no page data is pickled.
+# Every server worker has its own pool, so the default stays small.
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+PARALLEL_PDF_MIN_PAGES = 64  # Smaller PDFs are not worth the process overhead
+
+_pdf_executor: ProcessPoolExecutor | None = None
+
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    """Create the shared process pool on first use."""
+    global _pdf_executor
+    if _pdf_executor is None:
+        # Spawned workers avoid forking a process that is running threads
+        _pdf_executor = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pdf_executor
+
+def _extract_pages(doc: fitz.Document, start: int, stop: int) -> str:
+    """
+    Extract the plain text of pages [start, stop) of an open PDF.
+    
+    Each page is loaded on its own and dropped once its text is read, and
+    only text is requested, so images are never decoded or rendered.
+    """
+    return "".join(
+        doc.load_page(i).get_text("text", flags=PDF_TEXT_FLAGS, sort=False)
+        for i in range(start, stop)
+    )
+
+def _extract_page_range(path: str, start: int, stop: int) -> str:
+    """Extract the text of pages [start, stop) of a PDF on disk."""
+    with fitz.open(path, filetype="pdf") as doc:
+        return _extract_pages(doc, start, stop)
+
+def _extract_pdf_text_parallel(path: str, page_count: int) -> str:
+    """
+    Extract the text of a PDF using one page range per worker process.
+    
+    Args:
+        path (str): Path of the PDF on disk
+        page_count (int): Number of pages in the PDF
+        
+    Returns:
+        str: The text of all pages, in page order
+    """
+    step = -(-page_count // PDF_WORKERS)  # ceiling division
+    starts = range(0, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
+    results = _get_pdf_executor().map(_extract_page_range, [path] * len(starts), starts, stops)
+    return "".join(results)
+
+def extract_text_from_file(path: str, filename: str) -> str:
+    """
+    Extract text content from an uploaded file saved on disk (PDF or TXT).
+    
+    This function processes uploaded file contents and extracts their text
     for further AI processing. It supports both PDF and TXT file formats
-    with appropriate handling for each file type.
+    with appropriate handling for each file type. The caller saves the
+    upload with `save_upload_to_tempfile`; since PDF parsing is CPU-bound,
+    this function is meant to run in a worker thread (e.g. via
+    `asyncio.to_thread`).
     
     For PDF files:
     - Uses PyMuPDF (fitz) library for text extraction
+    - Opens the file by path, so the PDF is not copied into memory
+    - Splits large PDFs across worker processes by page range
     - Processes all pages in the document
-    - Handles various PDF layouts and formats
     - Concatenates text from all pages
     
     For TXT files:
-    - Reads raw bytes and decodes as UTF-8
-    - Handles text encoding properly
+    - Decodes the file contents as UTF-8, chunk by chunk
+    - Replaces stray invalid bytes instead of failing on them
+    - Rejects binary files and files with no text
     - Preserves original formatting
     
     Args:
-        file (UploadFile): The uploaded file object from FastAPI containing
-                          either a PDF or TXT file to process
+        path (str): Path of the saved upload
+        filename (str): The original filename, used to detect the file type
         
     Returns:
         str: The extracted text content from the file as a single string
         
     Raises:
         IOError: If there's an error processing the PDF or reading the TXT file
+        InvalidDocumentError: If a TXT file is empty or is not text
         ValueError: If the file format is not supported (not PDF or TXT)
         
     Example:
-        >>> from fastapi import UploadFile
-        >>> # Assuming 'uploaded_file' is an UploadFile object
-        >>> text = extract_text_from_upload_file(uploaded_file)
+        >>> # Assuming 'uploaded_file' is a FastAPI UploadFile object
+        >>> path, digest = await save_upload_to_tempfile(uploaded_file)
+        >>> text = await asyncio.to_thread(extract_text_from_file, path, uploaded_file.filename)
         >>> print(text[:100])  # Print first 100 characters
         "This is the extracted text from the document..."
     """
     # Extract file extension to determine processing method
     # Convert to lowercase for case-insensitive comparison
-    file_extension = file.filename.split('.')[-1].lower()
+    file_extension = filename.split('.')[-1].lower()
 
     if file_extension == "pdf":
         try:
             # Process PDF file using PyMuPDF
-            # Read the entire file content into memory as bytes
-            pdf_stream = io.BytesIO(file.file.read())
-            
-            # Open the PDF document from the byte stream
-            # Using stream parameter allows processing without saving to disk
-            doc = fitz.open(stream=pdf_stream, filetype="pdf")
-            
-            # Initialize empty string to accumulate text from all pages
-            text = ""
-            
-            # Iterate through all pages in the PDF document
-            for page in doc:
-                # Extract text from current page and append to result
-                # get_text() returns all text content from the page
-                text += page.get_text()
-            
-            # Close the document to free up memory resources
-            doc.close()
+            # Open the PDF document directly from disk; the context manager
+            # closes it to free up memory resources, even on errors
+            with fitz.open(path, filetype="pdf") as doc:
+                page_count = doc.page_count
+                
+                # Extract the text of every page and join it once at the end;
+                # appending to a str would copy the accumulated text every page
+                if page_count < PARALLEL_PDF_MIN_PAGES or PDF_WORKERS <= 1:
+                    return _extract_pages(doc, 0, page_count)
             
-            return text
+            # Large PDFs are split across worker processes
+            return _extract_pdf_text_parallel(path, page_count)
             
         except Exception as e:
             # Handle any errors during PDF processing
@@ -102,19 +208,30 @@ def extract_text_from_upload_file(file: UploadFile) -> str:
     elif file_extension == "txt":
         try:
             # Process TXT file
-            # Read the raw bytes from the uploaded file
-            file_bytes = file.file.read()
-            
-            # Decode bytes to string using UTF-8 encoding
-            # UTF-8 is the standard encoding for text files
-            text = file_bytes.decode("utf-8")
-            
-            return text
+            # Decode the file as UTF-8 one chunk at a time, so the whole file
+            # is never held as bytes and str at once. Invalid bytes become
+            # U+FFFD, so text with a few stray bytes is still accepted.
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            parts = []
+            with open(path, "rb") as f:
+                while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                    parts.append(decoder.decode(chunk))
+            parts.append(decoder.decode(b"", final=True))
+            text = "".join(parts)
             
         except Exception as e:
             # Handle any errors during TXT file processing
             # This includes encoding issues, corrupted files, etc.
             raise IOError(f"Error reading TXT file: {e}")
+        
+        # Reject files that are not really text; these are problems with the
+        # upload itself, so they are raised as-is for the caller to report
+        if not text.strip():
+            raise InvalidDocumentError("The uploaded file contains no text.")
+        if "\x00" in text or text.count("\ufffd") > len(text) * MAX_INVALID_TEXT_RATIO:
+            raise InvalidDocumentError("The uploaded file does not appear to be UTF-8 text.")
+        
+        return text
             
     else:
         # Unsupported file format
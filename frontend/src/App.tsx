@@ -187,11 +187,12 @@ function App() {
                 )}
                 
                 {/* Q&A Tab: Shows question-answer interface */}
-                {activeTab === 'qa' && <QuestionAnswer />}
+                {activeTab === 'qa' && <QuestionAnswer docId={uploadedDocument.doc_id} />}
                 
                 {/* Challenge Tab: Shows comprehension challenge interface */}
                 {activeTab === 'challenge' && (
                   <ChallengeMode 
+                    docId={uploadedDocument.doc_id}
                     questions={uploadedDocument.questions} 
                     onQuestionsUpdate={handleQuestionsUpdate}
                   />
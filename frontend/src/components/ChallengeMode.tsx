@@ -49,6 +49,12 @@ import { apiService } from '../services/api';
  * Props interface for ChallengeMode component
  */
 interface ChallengeModeProps {
+  /**
+   * Identifier of the uploaded document on the backend
+   * Sent with every evaluation and regeneration request
+   */
+  docId: string;
+  
   /**
    * Array of AI-generated questions for the challenge
    * Each question is a string that will be presented to the user
@@ -101,7 +107,7 @@ interface ChallengeResult {
  * Renders the complete challenge interface with question presentation,
  * answer evaluation, progress tracking, and results summary.
  */
-const ChallengeMode: React.FC<ChallengeModeProps> = ({ questions, onQuestionsUpdate }) => {
+const ChallengeMode: React.FC<ChallengeModeProps> = ({ docId, questions, onQuestionsUpdate }) => {
   // --- Component State ---
   
   /**
@@ -186,7 +192,7 @@ const ChallengeMode: React.FC<ChallengeModeProps> = ({ questions, onQuestionsUpd
 
     try {
       // Call API to evaluate the user's answer
-      const response = await apiService.evaluateAnswer(currentQuestion, userAnswer);
+      const response = await apiService.evaluateAnswer(docId, currentQuestion, userAnswer);
       
       // Create new result entry with evaluation data
       const newResult: ChallengeResult = {
@@ -237,8 +243,11 @@ const ChallengeMode: React.FC<ChallengeModeProps> = ({ questions, onQuestionsUpd
     setError(null);
 
     try {
-      // Call API to generate new questions with specified quantity
-      const response = await apiService.regenerateQuestions(numQuestions);
+      // Call API to generate new questions with specified quantity. A new
+      // count may reuse questions the server already generated for it; the
+      // same count always asks for a fresh set.
+      const fresh = numQuestions === questions.length;
+      const response = await apiService.regenerateQuestions(docId, numQuestions, fresh);
       
       // Update questions in parent component
       onQuestionsUpdate(response.questions);
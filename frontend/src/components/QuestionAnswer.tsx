@@ -22,9 +22,9 @@
  * 
  * Data Flow:
  * 1. User types question and submits form
- * 2. API call made to backend /api/ask endpoint
- * 3. Response added to history with timestamp
- * 4. UI updates to show conversation
+ * 2. Q&A entry added to history with timestamp
+ * 3. API call made to backend /api/ask endpoint
+ * 4. Answer streams into the entry as it is generated
  * 
  * @author aryanoutlaw
  * @version 1.0.0
@@ -37,6 +37,17 @@ import { MessageCircle, Send, Bot, User } from 'lucide-react';
 // Import API service for backend communication
 import { apiService } from '../services/api';
 
+/**
+ * Props interface for QuestionAnswer component
+ */
+interface QuestionAnswerProps {
+  /**
+   * Identifier of the uploaded document on the backend
+   * Sent with every question so answers come from the right document
+   */
+  docId: string;
+}
+
 /**
  * Interface for individual Q&A entries in the conversation history
  */
@@ -63,7 +74,7 @@ interface QAEntry {
  * Renders a chat-style interface for asking questions about the uploaded document
  * and displays the conversation history between user and AI.
  */
-const QuestionAnswer: React.FC = () => {
+const QuestionAnswer: React.FC<QuestionAnswerProps> = ({ docId }) => {
   // --- Component State ---
   
   /**
@@ -108,24 +119,36 @@ const QuestionAnswer: React.FC = () => {
     setIsLoading(true);
     setError(null);
 
+    // Add the new entry right away so the answer can fill in as it streams
+    const newEntry: QAEntry = {
+      question,
+      answer: '',
+      timestamp: new Date(),
+    };
+    setQaHistory(prev => [...prev, newEntry]);
+
+    /**
+     * Replaces the answer of the entry currently being streamed
+     * 
+     * @param answer - The answer text received so far
+     */
+    const updateLatestAnswer = (answer: string) => {
+      setQaHistory(prev => [
+        ...prev.slice(0, -1),
+        { ...prev[prev.length - 1], answer },
+      ]);
+    };
+
     try {
-      // Make API call to get answer from backend
-      const response = await apiService.askQuestion(question);
-      
-      // Create new Q&A entry with current timestamp
-      const newEntry: QAEntry = {
-        question,
-        answer: response.answer,
-        timestamp: new Date(),
-      };
-      
-      // Add new entry to conversation history
-      setQaHistory(prev => [...prev, newEntry]);
+      // Make API call to get answer from backend, updating the entry as chunks arrive
+      const response = await apiService.askQuestion(docId, question, updateLatestAnswer);
+      updateLatestAnswer(response.answer);
       
       // Clear the input field for next question
       setQuestion('');
     } catch (err) {
-      // Handle API errors and display user-friendly message
+      // Remove the unanswered entry and display user-friendly message
+      setQaHistory(prev => prev.slice(0, -1));
       setError('Failed to get answer. Please try again.');
       console.error('Question error:', err);
     } finally {
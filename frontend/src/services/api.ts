@@ -26,6 +26,12 @@ const api = axios.create({
  * Contains the processed document data returned by the backend
  */
 export interface UploadResponse {
+  /**
+   * Identifier of the processed document on the backend
+   * Passed to every follow-up request about this document
+   */
+  doc_id: string;
+  
   /**
    * Original filename of the uploaded document
    */
@@ -130,7 +136,10 @@ export const apiService = {
    * comprehension questions based on the currently uploaded document. The number
    * of questions can be customized between 3-10.
    * 
+   * @param docId - Identifier of the document returned by uploadDocument
    * @param numQuestions - Number of questions to generate (3-10)
+   * @param fresh - Generate a new set instead of returning questions the server
+   *                already generated for this number (default: true)
    * @returns Promise resolving to object containing array of new questions
    * 
    * @throws {Error} If generation fails due to network issues, server errors, or invalid parameters
@@ -138,17 +147,17 @@ export const apiService = {
    * @example
    * ```typescript
    * try {
-   *   const result = await apiService.regenerateQuestions(5);
+   *   const result = await apiService.regenerateQuestions(docId, 5);
    *   console.log('New questions:', result.questions);
    * } catch (error) {
    *   console.error('Question generation failed:', error);
    * }
    * ```
    */
-  regenerateQuestions: async (numQuestions: number): Promise<{ questions: string[] }> => {
-    // Make POST request with num_questions as query parameter
+  regenerateQuestions: async (docId: string, numQuestions: number, fresh: boolean = true): Promise<{ questions: string[] }> => {
+    // Make POST request with doc_id, num_questions and fresh as query parameters
     const response = await api.post<{ questions: string[] }>('/api/regenerate-questions', null, {
-      params: { num_questions: numQuestions }
+      params: { doc_id: docId, num_questions: numQuestions, fresh }
     });
     
     return response.data;
@@ -161,26 +170,75 @@ export const apiService = {
    * an answer based solely on the document content. The AI is instructed to provide
    * justification and references from the document.
    * 
+   * The backend streams the answer as Server-Sent Events, so this uses fetch
+   * (which exposes the response body as a stream) rather than axios. Each time
+   * a new piece of the answer arrives, `onChunk` is called with the answer so far.
+   * 
+   * @param docId - Identifier of the document returned by uploadDocument
    * @param question - The user's question about the document
-   * @returns Promise resolving to AskResponse with AI-generated answer
+   * @param onChunk - Optional callback receiving the partial answer as it streams in
+   * @returns Promise resolving to AskResponse with the complete AI-generated answer
    * 
    * @throws {Error} If request fails due to network issues, server errors, or no uploaded document
    * 
    * @example
    * ```typescript
    * try {
-   *   const result = await apiService.askQuestion("What is the main topic of this document?");
+   *   const result = await apiService.askQuestion(
+   *     docId,
+   *     "What is the main topic of this document?",
+   *     (partial) => console.log('So far:', partial)
+   *   );
    *   console.log('Answer:', result.answer);
    * } catch (error) {
    *   console.error('Question failed:', error);
    * }
    * ```
    */
-  askQuestion: async (question: string): Promise<AskResponse> => {
-    // Make POST request with question in request body
-    const response = await api.post<AskResponse>('/api/ask', { question });
+  askQuestion: async (
+    docId: string,
+    question: string,
+    onChunk?: (partialAnswer: string) => void
+  ): Promise<AskResponse> => {
+    // Make POST request with doc_id and question in request body
+    const response = await fetch(`${API_BASE_URL}/api/ask`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ doc_id: docId, question }),
+    });
     
-    return response.data;
+    if (!response.ok || !response.body) {
+      throw new Error(`Request failed with status ${response.status}`);
+    }
+    
+    // Read the event stream and accumulate the answer text
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+    
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      
+      // Events are separated by a blank line; keep any incomplete event buffered
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop() ?? '';
+      
+      for (const event of events) {
+        // Skip the final "done" event, which carries no text
+        if (event.startsWith('event: done')) continue;
+        
+        const dataLine = event.split('\n').find((line) => line.startsWith('data: '));
+        if (!dataLine) continue;
+        
+        answer += JSON.parse(dataLine.slice('data: '.length)).text;
+        onChunk?.(answer);
+      }
+    }
+    
+    return { answer: answer.trim() };
   },
 
   /**
@@ -190,6 +248,7 @@ export const apiService = {
    * The backend compares the answer against the document content and provides
    * detailed feedback along with a correctness assessment.
    * 
+   * @param docId - Identifier of the document returned by uploadDocument
    * @param question - The original challenge question
    * @param answer - The user's answer to evaluate
    * @returns Promise resolving to ChallengeResponse with evaluation and correctness
@@ -200,6 +259,7 @@ export const apiService = {
    * ```typescript
    * try {
    *   const result = await apiService.evaluateAnswer(
+   *     docId,
    *     "What is the main conclusion?",
    *     "The main conclusion is that AI will transform education."
    *   );
@@ -210,9 +270,9 @@ export const apiService = {
    * }
    * ```
    */
-  evaluateAnswer: async (question: string, answer: string): Promise<ChallengeResponse> => {
-    // Make POST request with question and answer in request body
-    const response = await api.post<ChallengeResponse>('/api/challenge', { question, answer });
+  evaluateAnswer: async (docId: string, question: string, answer: string): Promise<ChallengeResponse> => {
+    // Make POST request with doc_id, question and answer in request body
+    const response = await api.post<ChallengeResponse>('/api/challenge', { doc_id: docId, question, answer });
     
     return response.data;
   },
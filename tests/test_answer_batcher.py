@@ -0,0 +1,69 @@
+"""
+Tests for AnswerBatcher, which combines concurrent questions into one AI call.
+
+The batched Gemini call is replaced with a stub, so no API key is needed.
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from app import llm
+from app.llm import AnswerBatcher
+
+class AnswerBatcherTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_disabled_by_default(self):
+        batcher = AnswerBatcher()
+        self.assertEqual(batcher.window, 0)
+        self.assertIsNone(await batcher.ask("Document text", "What is it?"))
+
+    async def test_lone_question_is_released(self):
+        batcher = AnswerBatcher(window=0.01)
+        with mock.patch.object(llm, "answer_questions_batch") as batch_call:
+            answer = await batcher.ask("Document text", "What is it?")
+        self.assertIsNone(answer)
+        batch_call.assert_not_called()
+
+    async def test_concurrent_questions_share_one_call(self):
+        batcher = AnswerBatcher(window=0.01)
+
+        async def answer_all(context, questions):
+            return [f"answer to {question}" for question in questions]
+
+        with mock.patch.object(llm, "answer_questions_batch", side_effect=answer_all) as batch_call:
+            answers = await asyncio.gather(
+                batcher.ask("Document text", "first"),
+                batcher.ask("Document text", "second"),
+            )
+        self.assertEqual(answers, ["answer to first", "answer to second"])
+        batch_call.assert_called_once_with("Document text", ["first", "second"])
+
+    async def test_full_batch_is_flushed_without_waiting(self):
+        # A window this long would time the test out if the batch waited for it
+        batcher = AnswerBatcher(window=60, max_size=2)
+
+        async def answer_all(context, questions):
+            return [question.upper() for question in questions]
+
+        with mock.patch.object(llm, "answer_questions_batch", side_effect=answer_all):
+            answers = await asyncio.wait_for(
+                asyncio.gather(batcher.ask("Document text", "a"), batcher.ask("Document text", "b")),
+                timeout=1,
+            )
+        self.assertEqual(answers, ["A", "B"])
+        self.assertIsNone(batcher._timer)
+
+    async def test_failed_batch_falls_back_to_individual_answers(self):
+        batcher = AnswerBatcher(window=0.01)
+        failing = mock.AsyncMock(side_effect=ValueError("Expected 2 answers, got 1"))
+        with mock.patch.object(llm, "answer_questions_batch", failing):
+            answers = await asyncio.gather(
+                batcher.ask("Document text", "first"),
+                batcher.ask("Document text", "second"),
+            )
+        self.assertEqual(answers, [None, None])
+
+if __name__ == "__main__":
+    unittest.main()
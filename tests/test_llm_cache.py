@@ -0,0 +1,108 @@
+"""
+Tests for the llm_cache decorator on _generate_text: cached responses and
+single-flight sharing of concurrent identical calls.
+
+The Gemini call (_generate_content) is replaced with a stub, so no API key is
+needed. Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import types
+import unittest
+from unittest import mock
+
+from app import llm
+
+class StubGemini:
+    """Stands in for _generate_content, holding each call until released."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, prompt, **kwargs):
+        self.calls += 1
+        result = self.results.pop(0)
+        await self.release.wait()
+        if isinstance(result, Exception):
+            raise result
+        return types.SimpleNamespace(text=f" {result} ")
+
+class LLMCacheTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        llm._generate_text.cache.clear()
+        llm._generate_text.inflight.clear()
+        model = mock.patch.object(llm, "model", types.SimpleNamespace(model_name="test-model"), create=True)
+        model.start()
+        self.addCleanup(model.stop)
+
+    def stub(self, *results) -> StubGemini:
+        gemini = StubGemini(*results)
+        patcher = mock.patch.object(llm, "_generate_content", gemini)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return gemini
+
+    async def test_concurrent_calls_share_one_request(self):
+        gemini = self.stub("answer")
+        callers = [asyncio.create_task(llm._generate_text("prompt")) for _ in range(5)]
+        await asyncio.sleep(0)
+        gemini.release.set()
+        self.assertEqual(await asyncio.gather(*callers), ["answer"] * 5)
+        self.assertEqual(gemini.calls, 1)
+        self.assertEqual(llm._generate_text.inflight, {})
+
+    async def test_cached_response_skips_the_model(self):
+        gemini = self.stub("answer")
+        gemini.release.set()
+        self.assertEqual(await llm._generate_text("prompt"), "answer")
+        self.assertEqual(await llm._generate_text("prompt"), "answer")
+        self.assertEqual(gemini.calls, 1)
+
+    async def test_call_arguments_are_part_of_the_key(self):
+        gemini = self.stub("text", "json")
+        gemini.release.set()
+        self.assertEqual(await llm._generate_text("prompt"), "text")
+        self.assertEqual(await llm._generate_text("prompt", generation_config={"a": 1}), "json")
+        self.assertEqual(gemini.calls, 2)
+
+    async def test_cancelled_caller_does_not_cancel_the_shared_call(self):
+        gemini = self.stub("answer")
+        leaving = asyncio.create_task(llm._generate_text("prompt"))
+        staying = asyncio.create_task(llm._generate_text("prompt"))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        gemini.release.set()
+        self.assertEqual(await staying, "answer")
+        with self.assertRaises(asyncio.CancelledError):
+            await leaving
+        self.assertEqual(gemini.calls, 1)
+
+    async def test_call_completes_and_is_cached_when_every_caller_leaves(self):
+        gemini = self.stub("answer")
+        caller = asyncio.create_task(llm._generate_text("prompt"))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0)
+        gemini.release.set()
+        while llm._generate_text.inflight:
+            await asyncio.sleep(0)
+        self.assertEqual(await llm._generate_text("prompt"), "answer")
+        self.assertEqual(gemini.calls, 1)
+
+    async def test_failures_are_shared_but_not_cached(self):
+        gemini = self.stub(RuntimeError("quota"), "answer")
+        callers = [asyncio.create_task(llm._generate_text("prompt")) for _ in range(3)]
+        await asyncio.sleep(0)
+        gemini.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(gemini.calls, 1)
+        self.assertEqual(await llm._generate_text("prompt"), "answer")
+        self.assertEqual(gemini.calls, 2)
+
+if __name__ == "__main__":
+    unittest.main()
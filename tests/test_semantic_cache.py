@@ -0,0 +1,74 @@
+"""
+Tests for SemanticCache, the per-document cache of answers looked up by the
+question's text or embedding.
+
+Run with: python -m unittest discover tests
+"""
+
+import unittest
+
+import numpy as np
+
+from app.llm import SemanticCache
+
+def unit(i: int, size: int = 4) -> np.ndarray:
+    """Return the i-th basis vector, a normalized embedding."""
+    return np.eye(size, dtype=np.float32)[i]
+
+class SemanticCacheTest(unittest.TestCase):
+
+    def test_exact_match_ignores_case_and_whitespace(self):
+        cache = SemanticCache()
+        cache.add("What is  the topic?", None, "answer")
+        self.assertEqual(cache.lookup_exact("what is the TOPIC?"), "answer")
+
+    def test_lookup_by_similarity(self):
+        cache = SemanticCache(threshold=0.9)
+        cache.add("first", unit(0), "a0")
+        cache.add("second", unit(1), "a1")
+        self.assertEqual(cache.lookup(unit(1)), "a1")
+        self.assertIsNone(cache.lookup(unit(2)))
+        self.assertIsNone(SemanticCache().lookup(unit(0)))
+
+    def test_embeddings_are_stored_as_float32(self):
+        cache = SemanticCache(max_entries=3)
+        cache.add("first", unit(0).astype(np.float64), "a0")
+        self.assertEqual(cache._vectors.dtype, np.float32)
+        self.assertEqual(cache._vectors.shape, (3, 4))
+
+    def test_question_without_embedding_uses_no_row(self):
+        cache = SemanticCache(max_entries=2)
+        cache.add("no embedding", None, "text only")
+        cache.add("first", unit(0), "a0")
+        self.assertEqual(cache._count, 1)
+        self.assertEqual(cache.lookup(unit(0)), "a0")
+
+    def test_wraparound_overwrites_the_oldest_row(self):
+        cache = SemanticCache(max_entries=3)
+        for i in range(4):
+            cache.add(f"q{i}", unit(i), f"a{i}")
+        # The fourth entry takes the first one's row, and its answer moves with it
+        np.testing.assert_array_equal(cache._vectors[0], unit(3))
+        self.assertEqual(cache._answers, ["a3", "a1", "a2"])
+        self.assertEqual(cache._count, 3)
+        self.assertIsNone(cache.lookup(unit(0)))
+        self.assertEqual([cache.lookup(unit(i)) for i in range(1, 4)], ["a1", "a2", "a3"])
+
+    def test_rows_stay_aligned_after_several_wraps(self):
+        cache = SemanticCache(max_entries=3)
+        for i in range(8):
+            cache.add(f"q{i}", unit(i, size=8), f"a{i}")
+        for row in range(3):
+            i = int(np.argmax(cache._vectors[row]))
+            self.assertEqual(cache._answers[row], f"a{i}")
+        self.assertEqual([cache.lookup(unit(i, size=8)) for i in range(5, 8)], ["a5", "a6", "a7"])
+
+    def test_exact_matches_are_bounded(self):
+        cache = SemanticCache(max_entries=2)
+        for i in range(3):
+            cache.add(f"q{i}", None, f"a{i}")
+        self.assertIsNone(cache.lookup_exact("q0"))
+        self.assertEqual(cache.lookup_exact("q2"), "a2")
+
+if __name__ == "__main__":
+    unittest.main()